@@ -4,42 +4,60 @@ import time
 
 import httpx
 
+from coderev.backoff import backoff_sleep
 from coderev.config import ASK_TIMEOUT, HEALTH_POLL_INTERVAL, HEALTH_POLL_TIMEOUT
+from coderev.jsonutil import loads as json_loads
+
+_DATA_PREFIX = b"data: "
+_DONE = b"[DONE]"
 
 
 class ApiClient:
     def __init__(self, base_url: str, auth_token: str):
         self.base_url = base_url
         self.auth_token = auth_token
+        # HTTP/2 only negotiates over TLS, so this kicks in on the public
+        # codespace URL path; the local tunnel stays HTTP/1.1 keep-alive.
+        self._client = httpx.Client(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {auth_token}"} if auth_token else {},
+            timeout=httpx.Timeout(ASK_TIMEOUT),
+            http2=True,
+            limits=httpx.Limits(keepalive_expiry=60),
+        )
+
+    def close(self) -> None:
+        self._client.close()
 
-    def _headers(self) -> dict:
-        return {"Authorization": f"Bearer {self.auth_token}"}
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
 
     def wait_until_ready(self) -> dict:
         """Poll /health until the server is up."""
         deadline = time.monotonic() + HEALTH_POLL_TIMEOUT
         last_err = None
+        attempt = 0
         while time.monotonic() < deadline:
             try:
-                resp = httpx.get(
-                    f"{self.base_url}/health",
-                    timeout=5,
-                )
+                resp = self._client.get("/health", timeout=5)
                 if resp.status_code == 200:
                     return resp.json()
             except (httpx.ConnectError, httpx.ReadError, httpx.TimeoutException) as e:
                 last_err = e
-            time.sleep(HEALTH_POLL_INTERVAL)
+            backoff_sleep(attempt, cap=HEALTH_POLL_INTERVAL)
+            attempt += 1
         raise TimeoutError(
             f"Server not ready within {HEALTH_POLL_TIMEOUT}s. Last error: {last_err}"
         )
 
     def set_credentials(self, credentials: dict) -> None:
         """POST /credentials to write Claude OAuth creds to the codespace."""
-        resp = httpx.post(
-            f"{self.base_url}/credentials",
+        resp = self._client.post(
+            "/credentials",
             json=credentials,
-            headers=self._headers(),
             timeout=10,
         )
         resp.raise_for_status()
@@ -64,14 +82,9 @@ class ApiClient:
         if session_id:
             payload["session_id"] = session_id
 
-        resp = httpx.post(
-            f"{self.base_url}/ask",
-            json=payload,
-            headers=self._headers(),
-            timeout=ASK_TIMEOUT,
-        )
+        resp = self._client.post("/ask", json=payload)
         resp.raise_for_status()
-        return resp.json()
+        return json_loads(resp.content)
 
     def ask_stream(
         self,
@@ -90,17 +103,24 @@ class ApiClient:
         if model:
             payload["model"] = model
 
-        with httpx.stream(
-            "POST",
-            f"{self.base_url}/ask/stream",
-            json=payload,
-            headers=self._headers(),
-            timeout=ASK_TIMEOUT,
-        ) as resp:
+        with self._client.stream("POST", "/ask/stream", json=payload) as resp:
             resp.raise_for_status()
-            for line in resp.iter_lines():
-                if line.startswith("data: "):
-                    data = line[6:]
-                    if data == "[DONE]":
-                        return
-                    yield data
+            # Parse SSE at the byte level: split on b"\n" ourselves and only
+            # decode data payloads, instead of letting httpx materialise a
+            # decoded str for every line (including blanks and comments).
+            buf = bytearray()
+            for chunk in resp.iter_bytes():
+                buf.extend(chunk)
+                while (nl := buf.find(b"\n")) != -1:
+                    end = nl
+                    if end and buf[end - 1] == 0x0D:  # trailing \r
+                        end -= 1
+                    # Single-byte dispatch on 'd': blank lines, comments and
+                    # event:/id: fields are dropped without slicing a line out
+                    # of the buffer; only data payloads are materialised.
+                    if end >= 6 and buf[0] == 0x64 and buf[:6] == _DATA_PREFIX:
+                        payload = bytes(buf[6:end])
+                        if payload == _DONE:
+                            return
+                        yield payload.decode("utf-8")
+                    del buf[: nl + 1]
@@ -1,12 +1,12 @@
 """GitHub token resolution and coderev auth token caching."""
 
-import json
 import os
 import platform
 import subprocess
 from pathlib import Path
 
-CACHE_DIR = Path.home() / ".cache" / "coderev"
+from coderev.config import CACHE_DIR
+from coderev.jsonutil import dumps_bytes, loads as json_loads
 
 
 def get_github_token() -> str:
@@ -19,11 +19,12 @@ def get_github_token() -> str:
         result = subprocess.run(
             ["gh", "auth", "token"],
             capture_output=True,
-            text=True,
             timeout=10,
         )
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
+        if result.returncode == 0:
+            token = result.stdout.decode().strip()
+            if token:
+                return token
     except FileNotFoundError:
         pass
 
@@ -75,9 +76,9 @@ def _load_cached_token(codespace_name: str) -> str | None:
     path = _cache_path(codespace_name)
     if path.exists():
         try:
-            data = json.loads(path.read_text())
+            data = json_loads(path.read_bytes())
             return data.get("token")
-        except (json.JSONDecodeError, OSError):
+        except (ValueError, OSError):
             pass
     return None
 
@@ -85,8 +86,11 @@ def _load_cached_token(codespace_name: str) -> str | None:
 def _save_cached_token(codespace_name: str, token: str) -> None:
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
     path = _cache_path(codespace_name)
-    path.write_text(json.dumps({"token": token}))
-    path.chmod(0o600)
+    # Create with 0o600 directly rather than write-then-chmod: one fewer
+    # syscall and no window where the token is world-readable.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(dumps_bytes({"token": token}))
 
 
 def get_claude_oauth_credentials() -> dict:
@@ -100,21 +104,22 @@ def get_claude_oauth_credentials() -> dict:
             result = subprocess.run(
                 ["security", "find-generic-password", "-s", "Claude Code-credentials", "-w"],
                 capture_output=True,
-                text=True,
                 timeout=5,
             )
             if result.returncode == 0 and result.stdout.strip():
-                data = json.loads(result.stdout.strip())
+                # Keychain output is JSON bytes; parse directly without a
+                # str round-trip (the decoder tolerates the whitespace).
+                data = json_loads(result.stdout)
                 return data.get("claudeAiOauth", {})
-        except (subprocess.TimeoutExpired, json.JSONDecodeError, FileNotFoundError):
+        except (subprocess.TimeoutExpired, ValueError, FileNotFoundError):
             pass
     else:
         cred_path = Path.home() / ".claude" / ".credentials.json"
         if cred_path.exists():
             try:
-                data = json.loads(cred_path.read_text())
+                data = json_loads(cred_path.read_bytes())
                 return data.get("claudeAiOauth", {})
-            except (json.JSONDecodeError, OSError):
+            except (ValueError, OSError):
                 pass
 
     raise RuntimeError(
@@ -0,0 +1,21 @@
+"""Exponential backoff with full jitter for poll loops."""
+
+import asyncio
+import random
+import time
+
+
+def backoff_sleep(attempt: int, base: float = 0.5, cap: float = 5.0) -> None:
+    """Sleep for a random duration in [0, min(cap, base * 2**attempt)].
+
+    Full jitter de-synchronises concurrent pollers and avoids hammering
+    a server that needs longer than one fixed interval to come up.
+    """
+    delay = min(cap, base * 2**attempt)
+    time.sleep(random.uniform(0, delay))
+
+
+async def async_backoff_sleep(attempt: int, base: float = 0.5, cap: float = 5.0) -> None:
+    """Async variant of backoff_sleep."""
+    delay = min(cap, base * 2**attempt)
+    await asyncio.sleep(random.uniform(0, delay))
@@ -1,6 +1,6 @@
 """coderev CLI -- ask Claude Code questions about any repo via GitHub Codespaces."""
 
-import json
+import asyncio
 import sys
 
 import click
@@ -10,8 +10,9 @@ from rich.table import Table
 
 from coderev.api_client import ApiClient
 from coderev.auth import get_auth_token, get_claude_oauth_credentials, get_github_token
-from coderev.codespace import CodespaceManager
-from coderev.tunnel import Tunnel
+from coderev.codespace import AsyncCodespaceManager, CodespaceManager
+from coderev.jsonutil import loads as json_loads
+from coderev.tunnel import RemoteTunnel, Tunnel
 
 console = Console()
 
@@ -31,7 +32,13 @@ def cli():
 @click.option("--max-turns", default=30, help="Max agent turns")
 @click.option("--stream", is_flag=True, help="Stream response via SSE")
 @click.option("--session", "session_id", help="Resume a previous session")
-def ask(repo, branch, question, files, diff_range, model, max_turns, stream, session_id):
+@click.option(
+    "--no-tunnel",
+    is_flag=True,
+    help="Use the codespace's public port URL instead of a gh port-forward",
+)
+@click.option("--no-markdown", is_flag=True, help="Print the answer as plain text")
+def ask(repo, branch, question, files, diff_range, model, max_turns, stream, session_id, no_tunnel, no_markdown):
     """Ask Claude a question about code in REPO on BRANCH."""
     token = _get_token()
     mgr = CodespaceManager(token)
@@ -44,35 +51,38 @@ def ask(repo, branch, question, files, diff_range, model, max_turns, stream, ses
         )
     console.print(f"Codespace ready: [bold]{cs_name}[/bold]")
 
-    with Tunnel(cs_name) as tunnel:
+    tunnel_cls = RemoteTunnel if no_tunnel else Tunnel
+    with tunnel_cls(cs_name) as tunnel:
         with console.status("Waiting for coderev server..."):
-            tmp_client = ApiClient(tunnel.local_url, "")
-            health = tmp_client.wait_until_ready()
+            with ApiClient(tunnel.local_url, "") as tmp_client:
+                health = tmp_client.wait_until_ready()
 
         with console.status("Authenticating..."):
             auth_token = get_auth_token(tunnel.local_url, cs_name)
 
-        client = ApiClient(tunnel.local_url, auth_token)
-
-        with console.status("Pushing Claude credentials..."):
-            try:
-                creds = get_claude_oauth_credentials()
-                client.set_credentials(creds)
-            except RuntimeError as e:
-                console.print(f"[yellow]Warning:[/yellow] {e} (falling back to ANTHROPIC_API_KEY)")
-
-        console.print(
-            f"Server ready -- repo: {health.get('repo_dir')}, "
-            f"branch: {health.get('branch')}, commit: {health.get('commit')}"
-        )
-
-        if stream:
-            _ask_stream(client, question, list(files), diff_range, model, max_turns, session_id)
-        else:
-            _ask_sync(client, question, list(files), diff_range, model, max_turns, session_id)
-
-
-def _ask_sync(client, question, files, diff_range, model, max_turns, session_id):
+        with ApiClient(tunnel.local_url, auth_token) as client:
+            with console.status("Pushing Claude credentials..."):
+                try:
+                    creds = get_claude_oauth_credentials()
+                    client.set_credentials(creds)
+                except RuntimeError as e:
+                    console.print(f"[yellow]Warning:[/yellow] {e} (falling back to ANTHROPIC_API_KEY)")
+
+            console.print(
+                f"Server ready -- repo: {health.get('repo_dir')}, "
+                f"branch: {health.get('branch')}, commit: {health.get('commit')}"
+            )
+
+            if stream:
+                _ask_stream(client, question, list(files), diff_range, model, max_turns, session_id)
+            else:
+                _ask_sync(
+                    client, question, list(files), diff_range, model, max_turns, session_id,
+                    markdown=not no_markdown,
+                )
+
+
+def _ask_sync(client, question, files, diff_range, model, max_turns, session_id, markdown=True):
     with console.status("Claude is thinking..."):
         result = client.ask(
             question=question,
@@ -82,8 +92,16 @@ def _ask_sync(client, question, files, diff_range, model, max_turns, session_id)
             max_turns=max_turns,
             session_id=session_id,
         )
+    answer = result["answer"]
     console.print()
-    console.print(Markdown(result["answer"]))
+    # Markdown rendering reparses and re-highlights the whole answer;
+    # skip it for huge answers and for piped output.
+    if not markdown or len(answer) > 16_384 or not sys.stdout.isatty():
+        # markup=False: the answer is untrusted text and bracket sequences
+        # would otherwise be eaten (or crash) as rich markup.
+        console.print(answer, markup=False, highlight=False)
+    else:
+        console.print(Markdown(answer))
     console.print()
     usage = result.get("usage", {})
     duration = result.get("duration_seconds", 0)
@@ -92,13 +110,14 @@ def _ask_sync(client, question, files, diff_range, model, max_turns, session_id)
         meta_parts.append(f"[dim]${usage['cost_usd']:.4f}[/dim]")
     if "num_turns" in usage:
         meta_parts.append(f"[dim]{usage['num_turns']} turns[/dim]")
-    console.print(" | ".join(meta_parts))
+    console.print(" | ".join(meta_parts), highlight=False)
     if result.get("session_id"):
-        console.print(f"\n[dim]Session: {result['session_id']}[/dim]")
-        console.print("[dim]Continue with: coderev ask ... --session <id>[/dim]")
+        console.print(f"\n[dim]Session: {result['session_id']}[/dim]", highlight=False)
+        console.print("[dim]Continue with: coderev ask ... --session <id>[/dim]", highlight=False)
 
 
 def _ask_stream(client, question, files, diff_range, model, max_turns, session_id):
+    printed = ""
     for data in client.ask_stream(
         question=question,
         files=files or None,
@@ -106,15 +125,29 @@ def _ask_stream(client, question, files, diff_range, model, max_turns, session_i
         model=model,
         max_turns=max_turns,
     ):
+        # Cheap substring pre-filter: skip non-assistant events without
+        # paying a full JSON parse per event.
+        if '"type":"assistant"' not in data:
+            continue
         try:
-            event = json.loads(data)
-        except json.JSONDecodeError:
+            event = json_loads(data)
+        except ValueError:
             continue
-        # Print assistant text content as it arrives
         if event.get("type") == "assistant" and "content" in event:
-            for block in event["content"]:
-                if block.get("type") == "text":
-                    console.print(block["text"], end="")
+            text = "".join(
+                block["text"]
+                for block in event["content"]
+                if block.get("type") == "text"
+            )
+            if not text:
+                continue
+            # Cumulative snapshots repeat everything emitted so far; print
+            # only the new suffix so output stays linear in answer length.
+            if text.startswith(printed):
+                console.print(text[len(printed):], end="")
+            else:
+                console.print(text, end="")
+            printed = text
     console.print()
 
 
@@ -176,22 +209,33 @@ def cleanup(delete):
     mgr = CodespaceManager(token)
 
     codespaces = mgr.list_all()
-    stopped = 0
-    deleted = 0
-
-    for cs in codespaces:
-        name = cs["name"]
-        state = cs.get("state", "")
-        if state == "Available":
-            console.print(f"Stopping {name}...")
+    to_stop = [cs["name"] for cs in codespaces if cs.get("state") == "Available"]
+    to_delete = [
+        cs["name"]
+        for cs in codespaces
+        if cs.get("state") in ("Shutdown", "ShuttingDown")
+    ] if delete else []
+
+    for name in to_stop:
+        console.print(f"Stopping {name}...")
+    for name in to_delete:
+        console.print(f"Deleting {name}...")
+
+    if len(to_stop) + len(to_delete) > 2:
+        # Fan out concurrently over one HTTP/2 connection.
+        async def _run():
+            async with AsyncCodespaceManager(token) as amgr:
+                await amgr.stop_many(to_stop)
+                await amgr.delete_many(to_delete)
+
+        asyncio.run(_run())
+    else:
+        for name in to_stop:
             mgr.stop(name)
-            stopped += 1
-        elif state in ("Shutdown", "ShuttingDown") and delete:
-            console.print(f"Deleting {name}...")
+        for name in to_delete:
             mgr.delete(name)
-            deleted += 1
 
-    console.print(f"Stopped {stopped}, deleted {deleted} codespace(s).")
+    console.print(f"Stopped {len(to_stop)}, deleted {len(to_delete)} codespace(s).")
 
 
 def _get_token() -> str:
@@ -1,15 +1,45 @@
 """Codespace lifecycle management via GitHub REST API."""
 
+import asyncio
 import time
 
 import httpx
 
+from coderev.backoff import async_backoff_sleep, backoff_sleep
 from coderev.config import (
+    CACHE_DIR,
     CODESPACE_BOOT_TIMEOUT,
     CODESPACE_IDLE_TIMEOUT_MINUTES,
     CODESPACE_POLL_INTERVAL,
     MACHINE_TYPE,
 )
+from coderev.jsonutil import dumps_bytes, loads as json_loads
+
+_CODESPACE_MAP_PATH = CACHE_DIR / "codespace_map.json"
+
+
+def _load_codespace_map() -> dict:
+    try:
+        return json_loads(_CODESPACE_MAP_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_codespace_map(mapping: dict) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _CODESPACE_MAP_PATH.write_bytes(dumps_bytes(mapping))
+    except OSError:
+        pass  # cache is best-effort
+
+
+def _evict_cached_name(codespace_name: str) -> None:
+    mapping = _load_codespace_map()
+    stale = [key for key, name in mapping.items() if name == codespace_name]
+    if stale:
+        for key in stale:
+            del mapping[key]
+        _save_codespace_map(mapping)
 
 
 class CodespaceManager:
@@ -22,7 +52,10 @@ class CodespaceManager:
                 "X-GitHub-Api-Version": "2022-11-28",
             },
             timeout=30,
+            http2=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
         )
+        self._repo_id_cache: dict[str, int] = {}
 
     def find(self, repo: str, branch: str) -> dict | None:
         """Find an existing codespace for repo+branch."""
@@ -65,23 +98,45 @@ class CodespaceManager:
             f"/user/codespaces/{codespace_name}/stop",
         )
         resp.raise_for_status()
+        _evict_cached_name(codespace_name)
         return resp.json()
 
     def delete(self, codespace_name: str) -> None:
         """Delete a codespace."""
         resp = self.client.delete(f"/user/codespaces/{codespace_name}")
         resp.raise_for_status()
+        _evict_cached_name(codespace_name)
+
+    def get(self, codespace_name: str) -> dict | None:
+        """Fetch a codespace by name; None if it no longer exists."""
+        resp = self.client.get(f"/user/codespaces/{codespace_name}")
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
 
     def list_for_repo(self, repo: str) -> list[dict]:
         """List all codespaces for a given repo."""
-        repo_id = self._repo_id(repo)
+        if repo not in self._repo_id_cache:
+            # The unfiltered listing already carries repository.full_name,
+            # so filtering client-side skips the GET /repos/:repo hop.
+            return self.list_for_repos({repo}).get(repo, [])
         resp = self.client.get(
             "/user/codespaces",
-            params={"repository_id": repo_id},
+            params={"repository_id": self._repo_id(repo)},
         )
         resp.raise_for_status()
         return resp.json().get("codespaces", [])
 
+    def list_for_repos(self, repos: set[str]) -> dict[str, list[dict]]:
+        """List codespaces for several repos with a single API call."""
+        buckets: dict[str, list[dict]] = {repo: [] for repo in repos}
+        for cs in self.list_all():
+            full_repo = cs.get("repository", {}).get("full_name", "")
+            if full_repo in buckets:
+                buckets[full_repo].append(cs)
+        return buckets
+
     def list_all(self) -> list[dict]:
         """List all user codespaces."""
         resp = self.client.get("/user/codespaces")
@@ -93,6 +148,7 @@ class CodespaceManager:
     ) -> dict:
         """Poll until codespace state is Available."""
         deadline = time.monotonic() + CODESPACE_BOOT_TIMEOUT
+        attempt = 0
         while time.monotonic() < deadline:
             resp = self.client.get(f"/user/codespaces/{codespace_name}")
             resp.raise_for_status()
@@ -102,7 +158,8 @@ class CodespaceManager:
                 return cs
             if on_poll:
                 on_poll(state)
-            time.sleep(CODESPACE_POLL_INTERVAL)
+            backoff_sleep(attempt, cap=CODESPACE_POLL_INTERVAL)
+            attempt += 1
         raise TimeoutError(
             f"Codespace {codespace_name} did not become Available "
             f"within {CODESPACE_BOOT_TIMEOUT}s"
@@ -114,30 +171,132 @@ class CodespaceManager:
             if on_status:
                 on_status(msg)
 
+        # Warm path: remember the name from last time and fetch it directly,
+        # skipping the repo-id lookup and the full codespace listing.
+        key = f"{repo}@{branch}"
+        mapping = _load_codespace_map()
+        cached_name = mapping.get(key)
+        if cached_name:
+            cs = self.get(cached_name)
+            if (
+                cs
+                and cs.get("repository", {}).get("full_name", "") == repo
+                and cs.get("git_status", {}).get("ref", "") == branch
+            ):
+                return self._ensure_available(cs, _emit)
+            del mapping[key]
+            _save_codespace_map(mapping)
+
         cs = self.find(repo, branch)
         if cs:
-            state = cs.get("state", "Unknown")
+            name = self._ensure_available(cs, _emit)
+        else:
+            _emit("Creating new codespace...")
+            cs = self.create(repo, branch)
             name = cs["name"]
-            if state == "Available":
-                _emit(f"Reusing running codespace {name}")
-                return name
-            if state in ("Shutdown", "ShuttingDown"):
-                _emit(f"Starting stopped codespace {name}...")
-                self.start(name)
-                self.wait_until_available(name, on_poll=lambda s: _emit(f"Codespace {name}: {s}"))
-                return name
-            _emit(f"Codespace {name} is {state}, waiting...")
+            _emit(f"Created {name}, waiting for boot...")
             self.wait_until_available(name, on_poll=lambda s: _emit(f"Codespace {name}: {s}"))
-            return name
 
-        _emit("Creating new codespace...")
-        cs = self.create(repo, branch)
+        mapping[key] = name
+        _save_codespace_map(mapping)
+        return name
+
+    def _ensure_available(self, cs: dict, _emit) -> str:
+        state = cs.get("state", "Unknown")
         name = cs["name"]
-        _emit(f"Created {name}, waiting for boot...")
+        if state == "Available":
+            _emit(f"Reusing running codespace {name}")
+            return name
+        if state in ("Shutdown", "ShuttingDown"):
+            _emit(f"Starting stopped codespace {name}...")
+            self.start(name)
+        else:
+            _emit(f"Codespace {name} is {state}, waiting...")
         self.wait_until_available(name, on_poll=lambda s: _emit(f"Codespace {name}: {s}"))
         return name
 
     def _repo_id(self, repo: str) -> int:
+        if repo in self._repo_id_cache:
+            return self._repo_id_cache[repo]
         resp = self.client.get(f"/repos/{repo}")
         resp.raise_for_status()
-        return resp.json()["id"]
+        repo_id = resp.json()["id"]
+        self._repo_id_cache[repo] = repo_id
+        return repo_id
+
+
+class AsyncCodespaceManager:
+    """Async variant of CodespaceManager for fanning out API calls.
+
+    Shares one HTTP/2 connection across concurrent requests, so waiting
+    on or stopping K codespaces costs max(T) rather than K*T.
+    """
+
+    def __init__(self, token: str):
+        self.client = httpx.AsyncClient(
+            base_url="https://api.github.com",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            timeout=30,
+            http2=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.aclose()
+
+    async def list_all(self) -> list[dict]:
+        """List all user codespaces."""
+        resp = await self.client.get("/user/codespaces")
+        resp.raise_for_status()
+        return resp.json().get("codespaces", [])
+
+    async def stop(self, codespace_name: str) -> dict:
+        """Stop a running codespace."""
+        resp = await self.client.post(f"/user/codespaces/{codespace_name}/stop")
+        resp.raise_for_status()
+        _evict_cached_name(codespace_name)
+        return resp.json()
+
+    async def delete(self, codespace_name: str) -> None:
+        """Delete a codespace."""
+        resp = await self.client.delete(f"/user/codespaces/{codespace_name}")
+        resp.raise_for_status()
+        _evict_cached_name(codespace_name)
+
+    async def stop_many(self, codespace_names: list[str]) -> None:
+        """Stop several codespaces concurrently."""
+        await asyncio.gather(*(self.stop(name) for name in codespace_names))
+
+    async def delete_many(self, codespace_names: list[str]) -> None:
+        """Delete several codespaces concurrently."""
+        await asyncio.gather(*(self.delete(name) for name in codespace_names))
+
+    async def wait_until_available(self, codespace_name: str, on_poll=None) -> dict:
+        """Poll until codespace state is Available."""
+        deadline = time.monotonic() + CODESPACE_BOOT_TIMEOUT
+        attempt = 0
+        while time.monotonic() < deadline:
+            resp = await self.client.get(f"/user/codespaces/{codespace_name}")
+            resp.raise_for_status()
+            cs = resp.json()
+            state = cs.get("state", "Unknown")
+            if state == "Available":
+                return cs
+            if on_poll:
+                on_poll(state)
+            await async_backoff_sleep(attempt, cap=CODESPACE_POLL_INTERVAL)
+            attempt += 1
+        raise TimeoutError(
+            f"Codespace {codespace_name} did not become Available "
+            f"within {CODESPACE_BOOT_TIMEOUT}s"
+        )
@@ -1,5 +1,8 @@
 """Constants for coderev."""
 
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".cache" / "coderev"
 SERVER_PORT = 8976
 HEALTH_POLL_INTERVAL = 3
 HEALTH_POLL_TIMEOUT = 120
@@ -7,4 +10,5 @@ CODESPACE_POLL_INTERVAL = 5
 CODESPACE_BOOT_TIMEOUT = 300
 CODESPACE_IDLE_TIMEOUT_MINUTES = 30
 ASK_TIMEOUT = 310  # slightly above server-side 300s
+TUNNEL_READY_TIMEOUT = 10
 MACHINE_TYPE = "basicLinux32gb"  # 2-core, good enough for Claude
@@ -0,0 +1,30 @@
+"""JSON helpers -- orjson when available, stdlib json otherwise.
+
+orjson decodes bytes directly (no str intermediate) and is several
+times faster than the stdlib on the SSE/event hot paths. Both loads
+implementations raise a ValueError subclass on bad input, so callers
+catch ValueError.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj)
+
+else:
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj).encode()
@@ -1,9 +1,12 @@
 """Manage gh codespace ports forward subprocess."""
 
+import os
+import selectors
+import socket
 import subprocess
 import time
 
-from coderev.config import SERVER_PORT
+from coderev.config import SERVER_PORT, TUNNEL_READY_TIMEOUT
 
 
 class Tunnel:
@@ -30,11 +33,52 @@ class Tunnel:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
         )
-        # Give the tunnel a moment to establish
-        time.sleep(3)
-        if self._proc.poll() is not None:
-            stderr = self._proc.stderr.read().decode() if self._proc.stderr else ""
-            raise RuntimeError(f"Tunnel failed to start: {stderr}")
+        self._wait_ready()
+
+    def _wait_ready(self) -> None:
+        """Wait for the forward to come up, watching gh's stderr for the
+        readiness banner and confirming with a TCP connect.
+
+        gh prints "Forwarding ports ..." to stderr once the tunnel is
+        established; select() on that pipe paces the probe loop (and keeps
+        the pipe drained) instead of a blind fixed sleep.
+        """
+        fd = self._proc.stderr.fileno()
+        os.set_blocking(fd, False)
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+        stderr_buf = b""
+        deadline = time.monotonic() + TUNNEL_READY_TIMEOUT
+        try:
+            while time.monotonic() < deadline:
+                if self._proc.poll() is not None:
+                    raise RuntimeError(
+                        f"Tunnel failed to start: {stderr_buf.decode(errors='replace')}"
+                    )
+                if sel.select(timeout=0.1):
+                    try:
+                        stderr_buf += os.read(fd, 4096)
+                    except BlockingIOError:
+                        pass
+                # Probe every pass; the banner just lets us connect sooner
+                # than a fixed sleep would, and is not load-bearing if gh
+                # ever rewords it.
+                banner_seen = b"Forwarding" in stderr_buf or b"Listening on" in stderr_buf
+                try:
+                    socket.create_connection(
+                        ("127.0.0.1", self.port), timeout=0.5 if banner_seen else 0.2
+                    ).close()
+                    return
+                except OSError:
+                    continue
+        finally:
+            sel.close()
+        # open() raises out of __enter__, so close() would never run;
+        # tear the forwarder down here or it outlives the CLI.
+        self.close()
+        raise RuntimeError(
+            f"Tunnel did not accept connections within {TUNNEL_READY_TIMEOUT}s"
+        )
 
     def close(self) -> None:
         if self._proc and self._proc.poll() is None:
@@ -51,3 +95,32 @@ class Tunnel:
 
     def __exit__(self, *_):
         self.close()
+
+
+class RemoteTunnel:
+    """Direct HTTPS access to a codespace's forwarded port -- no subprocess.
+
+    Codespace port-forward URLs follow a stable name-based format, so we
+    can address the server without forking gh at all. Requires the port's
+    visibility to be public on the codespace.
+    """
+
+    def __init__(self, codespace_name: str, port: int = SERVER_PORT):
+        self.codespace_name = codespace_name
+        self.port = port
+
+    @property
+    def local_url(self) -> str:
+        return f"https://{self.codespace_name}-{self.port}.app.github.dev"
+
+    def open(self) -> None:
+        pass  # nothing to start
+
+    def close(self) -> None:
+        pass  # nothing to tear down
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
@@ -31,7 +31,8 @@ fi
 
 # ── Install Python dependencies ──
 echo "Installing Python dependencies..."
-pip install --quiet fastapi uvicorn || pip3 install --quiet fastapi uvicorn
+REQUIREMENTS="$DOTFILES_DIR/server/requirements.txt"
+pip install --quiet -r "$REQUIREMENTS" || pip3 install --quiet -r "$REQUIREMENTS"
 
 # ── API server path ──
 chmod +x "$SERVER_DEST"
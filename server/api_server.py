@@ -6,13 +6,36 @@ import json
 import os
 import subprocess
 import time
+from dataclasses import dataclass
 from pathlib import Path
 
 from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj)
+
+else:
+    _json_loads = json.loads
+
+    def _json_dumps_bytes(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+
+# ORJSONResponse serializes on the orjson side, skipping FastAPI's
+# jsonable_encoder walk — worth it on the high-rate probe endpoints.
+_FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
 AUTH_TOKEN = os.environ["AUTH_TOKEN"]
 REPO_DIR = os.environ["REPO_DIR"]
 PORT = 8976
@@ -35,10 +58,21 @@ ALLOWED_TOOLS = [
 ]
 
 app = FastAPI(title="coderev")
-claude_lock = asyncio.Lock()
+# Bounded semaphore instead of a single global lock: up to N Claude
+# calls run concurrently, so one long-running stream no longer blocks
+# every other client.
+claude_sem = asyncio.Semaphore(int(os.environ.get("CLAUDE_CONCURRENCY", "4")))
+_running_procs: set = set()
 auth_token_claimed = False
 
 
+@app.on_event("shutdown")
+async def _kill_running_procs():
+    for proc in list(_running_procs):
+        if proc.returncode is None:
+            proc.kill()
+
+
 def _verify_auth(authorization: str | None):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
@@ -46,40 +80,94 @@ def _verify_auth(authorization: str | None):
         raise HTTPException(status_code=403, detail="Invalid token")
 
 
-def _git(cmd: str) -> str:
+def _git_branch_and_commit() -> tuple[str, str]:
+    """Resolve branch and short commit with a single git invocation.
+
+    rev-parse flags are modal, so --short and --abbrev-ref cannot be
+    combined; we take the full sha plus abbrev-ref and truncate the sha.
+    """
     result = subprocess.run(
-        f"git {cmd}",
-        shell=True,
+        ["git", "rev-parse", "HEAD", "--abbrev-ref", "HEAD"],
         cwd=REPO_DIR,
         capture_output=True,
         text=True,
         timeout=10,
     )
-    return result.stdout.strip()
+    lines = result.stdout.splitlines()
+    if len(lines) >= 2:
+        return lines[1].strip(), lines[0].strip()[:7]
+    return "", ""
 
 
-@app.get("/health")
-async def health():
-    branch = _git("rev-parse --abbrev-ref HEAD")
-    commit = _git("rev-parse --short HEAD")
-    claude_version = ""
+def _claude_version() -> str:
     try:
         r = subprocess.run(
             ["claude", "--version"], capture_output=True, text=True, timeout=5
         )
-        claude_version = r.stdout.strip()
+        return r.stdout.strip()
     except Exception:
-        pass
-    return {
-        "status": "ok",
-        "repo_dir": REPO_DIR,
-        "branch": branch,
-        "commit": commit,
-        "claude_version": claude_version,
-    }
+        return ""
+
 
+# The claude binary never changes within a server process; resolve once
+# at startup (off the import path, and without blocking the loop).
+@app.on_event("startup")
+async def _resolve_claude_version():
+    app.state.claude_version = await asyncio.to_thread(_claude_version)
 
-@app.post("/auth-token")
+
+# Env for Claude subprocesses, with ANTHROPIC_API_KEY stripped so it uses
+# OAuth. os.environ doesn't change after startup, so build the dict once
+# instead of copying ~100 entries per request.
+_CLAUDE_ENV = {k: v for k, v in os.environ.items() if k != "ANTHROPIC_API_KEY"}
+
+# Branch/commit only move on a checkout or push. Serve from cache while
+# the TTL holds and .git/HEAD is untouched; a HEAD mtime change (branch
+# switch) invalidates immediately.
+_HEALTH_TTL = 30.0
+_health_cache: dict = {"t": 0.0, "v": None, "head_mtime": -1.0}
+_health_lock = asyncio.Lock()
+
+
+def _head_mtime() -> float:
+    try:
+        return os.stat(os.path.join(REPO_DIR, ".git", "HEAD")).st_mtime
+    except OSError:
+        return -1.0
+
+
+def _health_cache_fresh() -> bool:
+    return (
+        _health_cache["v"] is not None
+        and time.monotonic() - _health_cache["t"] < _HEALTH_TTL
+        and _head_mtime() == _health_cache["head_mtime"]
+    )
+
+
+@app.get("/health", response_class=_FastJSONResponse)
+async def health():
+    if _health_cache_fresh():
+        return _health_cache["v"]
+    async with _health_lock:
+        # Re-check under the lock so concurrent cold-cache hits fork git once.
+        if _health_cache_fresh():
+            return _health_cache["v"]
+        head_mtime = _head_mtime()
+        branch, commit = await asyncio.to_thread(_git_branch_and_commit)
+        payload = {
+            "status": "ok",
+            "repo_dir": REPO_DIR,
+            "branch": branch,
+            "commit": commit,
+            "claude_version": getattr(app.state, "claude_version", ""),
+        }
+        _health_cache["v"] = payload
+        _health_cache["t"] = time.monotonic()
+        _health_cache["head_mtime"] = head_mtime
+        return payload
+
+
+@app.post("/auth-token", response_class=_FastJSONResponse)
 async def claim_auth_token():
     """One-time endpoint to retrieve the bearer token. Disabled after first use."""
     global auth_token_claimed
@@ -105,9 +193,30 @@ async def set_credentials(req: SetCredentialsRequest, authorization: str | None
     cred_dir = Path.home() / ".claude"
     cred_dir.mkdir(parents=True, exist_ok=True)
     cred_path = cred_dir / ".credentials.json"
-    cred_data = {"claudeAiOauth": req.model_dump()}
-    cred_path.write_text(json.dumps(cred_data))
-    cred_path.chmod(0o600)
+    # Claude Code refreshes this file in-container; don't stomp a token
+    # that is at least as fresh as the incoming one and not near expiry.
+    try:
+        existing = _json_loads(cred_path.read_bytes())["claudeAiOauth"]
+        if (
+            existing["expiresAt"] >= req.expiresAt
+            and existing["expiresAt"] > time.time() * 1000 + 300_000
+        ):
+            return {"status": "unchanged"}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    # Serialize straight from the model (Rust-side in pydantic v2) and
+    # splice in the wrapper key, skipping the intermediate dict walk.
+    payload = b'{"claudeAiOauth":' + req.model_dump_json().encode() + b"}"
+    # Write a 0600 temp file and rename over the target: the mode applies
+    # from creation (no chmod, no world-readable window) and a concurrent
+    # reader never sees a partial file.
+    tmp_path = cred_path.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, cred_path)
     return {"status": "ok"}
 
 
@@ -128,13 +237,21 @@ class AskResponse(BaseModel):
 
 
 def _build_prompt(req: AskRequest) -> str:
-    parts = []
-    if req.diff_range:
-        parts.append(f"Consider the diff for range `{req.diff_range}`.")
-    if req.files:
-        parts.append(f"Focus on these files: {', '.join(req.files)}")
-    parts.append(req.question)
-    return "\n\n".join(parts)
+    if not req.diff_range and not req.files:
+        # Common case: the question is the prompt, no list/join churn.
+        return req.question
+    return "\n\n".join(
+        part
+        for part in (
+            f"Consider the diff for range `{req.diff_range}`." if req.diff_range else None,
+            f"Focus on these files: {', '.join(req.files)}" if req.files else None,
+            req.question,
+        )
+        if part
+    )
+
+
+_ALLOWED_TOOLS_CSV = ",".join(ALLOWED_TOOLS)
 
 
 def _build_claude_cmd(req: AskRequest, stream: bool = False) -> list[str]:
@@ -142,7 +259,7 @@ def _build_claude_cmd(req: AskRequest, stream: bool = False) -> list[str]:
     cmd = [
         "claude",
         "-p", prompt,
-        "--allowedTools", ",".join(ALLOWED_TOOLS),
+        "--allowedTools", _ALLOWED_TOOLS_CSV,
         "--max-turns", str(req.max_turns),
         "--output-format", "stream-json" if stream else "json",
     ]
@@ -153,29 +270,50 @@ def _build_claude_cmd(req: AskRequest, stream: bool = False) -> list[str]:
     return cmd
 
 
+# Cap on how much Claude output /ask will attempt to parse. A 30-turn
+# session can emit many MB; parsing unbounded input on the event loop is
+# a single-request DoS.
+_MAX_CLAUDE_OUTPUT = 8 * 1024 * 1024
+
+
+def _last_json_object(out: bytes) -> dict | None:
+    """Salvage the final JSON object when stream-json framing leaks in."""
+    for line in reversed(out.splitlines()):
+        line = line.strip()
+        if line.startswith(b"{"):
+            try:
+                return _json_loads(line)
+            except ValueError:
+                continue
+    return None
+
+
 @app.post("/ask", response_model=AskResponse)
 async def ask(req: AskRequest, authorization: str | None = Header(None)):
     _verify_auth(authorization)
 
-    async with claude_lock:
-        start = time.monotonic()
-        try:
-            proc = await asyncio.wait_for(
-                _run_claude(req),
-                timeout=300,
-            )
-        except asyncio.TimeoutError:
-            raise HTTPException(status_code=504, detail="Claude timed out (120s)")
-
-        elapsed = time.monotonic() - start
+    async with claude_sem:
+        start_ns = time.monotonic_ns()
+        proc = await _run_claude(req)
+        # Integer ns -> centiseconds -> seconds: two exact decimals with
+        # no float subtraction/round artifacts.
+        duration = (time.monotonic_ns() - start_ns) // 10_000_000 / 100
 
-    try:
-        result = json.loads(proc.stdout)
-    except (json.JSONDecodeError, TypeError):
+    if len(proc.stdout) > _MAX_CLAUDE_OUTPUT:
         raise HTTPException(
             status_code=502,
-            detail=f"Failed to parse Claude output: {proc.stdout[:500]}",
+            detail=f"Claude output too large ({len(proc.stdout)} bytes)",
         )
+    try:
+        # stdout stays bytes all the way to the parser; no str intermediate.
+        result = _json_loads(proc.stdout)
+    except (ValueError, TypeError):
+        result = _last_json_object(proc.stdout)
+        if result is None or not isinstance(result, dict):
+            raise HTTPException(
+                status_code=502,
+                detail=f"Failed to parse Claude output: {proc.stdout[:500].decode(errors='replace')}",
+            )
 
     answer = result.get("result", "")
     if not answer:
@@ -193,32 +331,49 @@ async def ask(req: AskRequest, authorization: str | None = Header(None)):
         usage["output_tokens"] = u["output_tokens"]
 
     session_id = result.get("session_id")
-    return AskResponse(answer=answer, session_id=session_id, usage=usage, duration_seconds=round(elapsed, 2))
+    return AskResponse(answer=answer, session_id=session_id, usage=usage, duration_seconds=duration)
 
 
-def _claude_env() -> dict:
-    """Build env for Claude subprocess, stripping ANTHROPIC_API_KEY so it uses OAuth."""
-    env = os.environ.copy()
-    env.pop("ANTHROPIC_API_KEY", None)
-    return env
+@dataclass
+class ClaudeResult:
+    returncode: int
+    stdout: bytes
+    stderr: bytes
 
 
-async def _run_claude(req: AskRequest) -> subprocess.CompletedProcess:
+async def _run_claude(req: AskRequest) -> ClaudeResult:
     cmd = _build_claude_cmd(req)
-    proc = await asyncio.to_thread(
-        subprocess.run,
-        cmd,
-        capture_output=True,
-        text=True,
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
         cwd=REPO_DIR,
-        env=_claude_env(),
-        timeout=300,
+        env=_CLAUDE_ENV,
     )
-    if proc.returncode != 0 and not proc.stdout:
+    _running_procs.add(proc)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=300)
+    except asyncio.TimeoutError:
+        proc.kill()
+        raise HTTPException(status_code=504, detail="Claude timed out (300s)")
+    except asyncio.CancelledError:
+        # Don't leak the child if the request itself is cancelled.
+        proc.kill()
+        raise
+    finally:
+        _running_procs.discard(proc)
+    if proc.returncode != 0 and not out:
         raise HTTPException(
-            status_code=502, detail=f"Claude failed: {proc.stderr[:500]}"
+            status_code=502,
+            detail=f"Claude failed: {err[:500].decode(errors='replace')}",
         )
-    return proc
+    return ClaudeResult(proc.returncode, out, err)
+
+
+async def _drain(stream) -> None:
+    """Read a pipe to EOF so the child never blocks on a full buffer."""
+    while await stream.readline():
+        pass
 
 
 @app.post("/ask/stream")
@@ -228,27 +383,77 @@ async def ask_stream(req: AskRequest, authorization: str | None = Header(None)):
     cmd = _build_claude_cmd(req, stream=True)
 
     async def generate():
-        async with claude_lock:
+        async with claude_sem:
             proc = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 cwd=REPO_DIR,
-                env=_claude_env(),
+                env=_CLAUDE_ENV,
             )
+            _running_procs.add(proc)
+            # Claude can write >64 KB of diagnostics to stderr; without a
+            # drainer the pipe fills and the child stalls mid-stream.
+            stderr_task = asyncio.create_task(_drain(proc.stderr))
             try:
-                async for line in proc.stdout:
-                    decoded = line.decode().strip()
-                    if decoded:
-                        yield f"data: {decoded}\n\n"
+                # Claude emits one JSON object per line; read in bulk chunks
+                # and split on newlines ourselves rather than paying a
+                # readline() coroutine per line of a token-dense stream.
+                buf = bytearray()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(proc.stdout.read(4096), timeout=15)
+                    except asyncio.TimeoutError:
+                        # SSE comment ping: long turns can go minutes without
+                        # output, and idle proxies would drop the stream.
+                        yield b": ping\n\n"
+                        continue
+                    if not chunk:
+                        break
+                    buf.extend(chunk)
+                    while (i := buf.find(b"\n")) != -1:
+                        line = bytes(buf[:i]).strip()
+                        del buf[: i + 1]
+                        if line:
+                            yield b"data: " + line + b"\n\n"
+                # Flush an unterminated trailing line on EOF.
+                line = bytes(buf).strip()
+                if line:
+                    yield b"data: " + line + b"\n\n"
                 await asyncio.wait_for(proc.wait(), timeout=120)
             except asyncio.TimeoutError:
                 proc.kill()
-                yield f"data: {json.dumps({'error': 'timeout'})}\n\n"
-            yield "data: [DONE]\n\n"
-
-    return StreamingResponse(generate(), media_type="text/event-stream")
+                yield b"data: " + _json_dumps_bytes({"error": "timeout"}) + b"\n\n"
+            finally:
+                stderr_task.cancel()
+                # A client disconnect closes the generator early; the
+                # output is unusable, so don't let the child run on
+                # holding quota (and a semaphore permit it no longer has).
+                if proc.returncode is None:
+                    proc.kill()
+                _running_procs.discard(proc)
+            yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    # loop/http "auto" picks uvloop and httptools when installed (they are
+    # in requirements.txt), falling back to the stdlib loop and h11.
+    # WORKERS > 1 needs the import-string form; note that the one-time
+    # /auth-token claim and the Claude semaphore are per-worker state, so
+    # the default stays a single worker.
+    workers = int(os.environ.get("WORKERS", "1"))
+    uvicorn.run(
+        "api_server:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=PORT,
+        loop="auto",
+        http="auto",
+        workers=workers,
+    )